@@ -0,0 +1,177 @@
+"""
+Banc de test des commandes descendantes (downlink).
+Enregistre un grand nombre de devices simulés derrière un seul abonnement
+wildcard, envoie des commandes depuis un client "backend" et mesure la
+latence aller-retour commande → acquittement.
+
+Usage :
+    python benchmark_commands.py --devices 100000 --commands 5000 --rate 500
+"""
+
+import os
+import math
+import time
+import uuid
+import random
+import sys
+import argparse
+import logging
+import threading
+from typing import Dict, Any, List
+from devices import SimulatedDevice, COMMAND_TOPIC, COMMAND_SUBSCRIPTION
+from mqtt_client import MQTTClient
+
+
+logger = logging.getLogger(__name__)
+
+ACK_SUBSCRIPTION = "iot/device/+/ack"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Calcule un percentile (méthode du rang le plus proche).
+
+    Args:
+        values: Valeurs triées
+        pct: Percentile entre 0 et 100
+
+    Returns:
+        Valeur du percentile
+    """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def build_command(index: int) -> Dict[str, Any]:
+    """
+    Construit une commande de test en alternant les types de commande.
+
+    Args:
+        index: Numéro de la commande
+
+    Returns:
+        Commande JSON (sans request_id ni sent_at)
+    """
+    kind = index % 3
+    if kind == 0:
+        return {'command': 'update_interval', 'interval': round(random.uniform(0.5, 10.0), 1)}
+    if kind == 1:
+        return {
+            'command': 'update_sensor',
+            'sensor': 'temperature',
+            'params': {'base_temp': round(random.uniform(15.0, 30.0), 1)}
+        }
+    return {'command': 'reboot'}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Latence des commandes MQTT descendantes")
+    parser.add_argument('--devices', type=int, default=100000, help="Nombre de devices simulés")
+    parser.add_argument('--commands', type=int, default=5000, help="Nombre de commandes envoyées")
+    parser.add_argument('--rate', type=float, default=500.0, help="Commandes par seconde (0 = sans limite)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Attente max des acquittements (s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    # La publication journalise chaque message : trop verbeux pour un benchmark
+    logging.getLogger('mqtt_client').setLevel(logging.WARNING)
+    logging.getLogger('devices').setLevel(logging.WARNING)
+
+    broker_host = os.getenv('BROKER_HOST', 'localhost')
+    broker_port = int(os.getenv('BROKER_PORT', '1883'))
+
+    # Flotte de devices : un seul abonnement wildcard, routage par TopicTrie
+    fleet = MQTTClient(broker_host, broker_port, client_id=f"iot_fleet_{uuid.uuid4().hex[:8]}")
+    fleet.subscribe(COMMAND_SUBSCRIPTION, qos=1)
+
+    start = time.perf_counter()
+    device_ids = [f"dev{i:06d}" for i in range(args.devices)]
+    for device_id in device_ids:
+        SimulatedDevice(device_id).attach(fleet)
+    logger.info(f"{len(fleet.routes)} devices enregistrés en {time.perf_counter() - start:.2f}s")
+
+    # Backend : envoie les commandes et mesure les acquittements
+    backend = MQTTClient(broker_host, broker_port, client_id=f"iot_backend_{uuid.uuid4().hex[:8]}")
+    backend.subscribe(ACK_SUBSCRIPTION, qos=1)
+
+    pending: Dict[str, float] = {}
+    latencies: List[float] = []
+    processing: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def on_ack(topic: str, data: Dict[str, Any]):
+        nonlocal errors
+        received = time.perf_counter()
+        with lock:
+            sent = pending.pop(data.get('request_id'), None)
+            if sent is None:
+                return
+            latencies.append((received - sent) * 1000)
+            processing.append(data.get('processing_ms', 0.0))
+            if data.get('status') != 'success':
+                errors += 1
+            if len(latencies) >= args.commands:
+                done.set()
+
+    backend.add_route(ACK_SUBSCRIPTION, on_ack)
+
+    # Attendre les SUBACK : sinon les premières commandes seraient perdues
+    ready = fleet.connect() and backend.connect()
+    ready = ready and fleet.wait_subscribed() and backend.wait_subscribed()
+    if not ready:
+        logger.error("Impossible de se connecter ou de s'abonner au broker MQTT")
+        fleet.disconnect()
+        backend.disconnect()
+        return 1
+
+    delay = 1.0 / args.rate if args.rate > 0 else 0.0
+    start = time.perf_counter()
+    for i in range(args.commands):
+        device_id = random.choice(device_ids)
+        request_id = uuid.uuid4().hex
+        command = build_command(i)
+        command['request_id'] = request_id
+        command['sent_at'] = time.time()
+
+        with lock:
+            pending[request_id] = time.perf_counter()
+        backend.publish(COMMAND_TOPIC.format(device_id=device_id), command, qos=1)
+
+        if delay:
+            next_send = start + (i + 1) * delay
+            sleep = next_send - time.perf_counter()
+            if sleep > 0:
+                time.sleep(sleep)
+
+    done.wait(args.timeout)
+    fleet.disconnect()
+    backend.disconnect()
+
+    with lock:
+        values = sorted(latencies)
+        lost = len(pending)
+        mean_processing = sum(processing) / len(processing) if processing else 0.0
+
+    logger.info("=" * 60)
+    logger.info(f"Devices : {args.devices} | Commandes : {args.commands} | Débit visé : {args.rate}/s")
+    logger.info(f"Acquittements : {len(values)} | Perdus : {lost} | Erreurs : {errors}")
+    if values:
+        logger.info(
+            f"RTT (ms) : moy={sum(values) / len(values):.2f} "
+            f"p50={percentile(values, 50):.2f} p95={percentile(values, 95):.2f} "
+            f"p99={percentile(values, 99):.2f} max={values[-1]:.2f}"
+        )
+        logger.info(f"Traitement device (ms) : moy={mean_processing:.3f}")
+    logger.info("=" * 60)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
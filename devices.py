@@ -0,0 +1,266 @@
+"""
+Module contenant le device IoT simulé.
+Regroupe les capteurs d'un device, sa configuration et le traitement
+des commandes descendantes (downlink) reçues via MQTT.
+"""
+
+import copy
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+from sensors import TemperatureSensor, HumiditySensor, GPSSensor
+
+
+logger = logging.getLogger(__name__)
+
+# Topics de commande et d'acquittement par device
+COMMAND_TOPIC = "iot/device/{device_id}/cmd"
+ACK_TOPIC = "iot/device/{device_id}/ack"
+COMMAND_SUBSCRIPTION = "iot/device/+/cmd"
+
+DEFAULT_CONFIG = {
+    'interval': 1.0,
+    'sensors': {
+        'temperature': {
+            'base_temp': 22.0,
+            'noise_range': 2.5,
+            'enabled': True
+        },
+        'humidity': {
+            'initial_humidity': 55.0,
+            'enabled': True
+        },
+        'gps': {
+            'lat': 48.8566,
+            'lon': 2.3522,
+            'enabled': True
+        }
+    }
+}
+
+
+class SimulatedDevice:
+    """
+    Device IoT simulé possédant ses capteurs et sa configuration.
+    Les mises à jour passent par les mêmes méthodes, qu'elles viennent
+    de l'API REST ou d'une commande MQTT.
+    """
+
+    def __init__(self, device_id: str, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialise le device simulé.
+
+        Args:
+            device_id: Identifiant du device (utilisé dans les topics)
+            config: Configuration partagée contenant 'interval' et 'sensors'
+                    (copie de DEFAULT_CONFIG si None)
+        """
+        self.device_id = device_id
+        self.config = config if config is not None else copy.deepcopy(DEFAULT_CONFIG)
+        self.sensors = {}
+        self.mqtt_client = None
+        self.init_sensors()
+
+    def init_sensors(self):
+        """
+        (Ré)initialise les capteurs avec les paramètres actuels.
+        """
+        config = self.config['sensors']
+        self.sensors = {
+            'temperature': TemperatureSensor(
+                base_temp=config['temperature']['base_temp'],
+                noise_range=config['temperature']['noise_range']
+            ),
+            'humidity': HumiditySensor(
+                initial_humidity=config['humidity']['initial_humidity']
+            ),
+            'gps': GPSSensor(
+                initial_lat=config['gps']['lat'],
+                initial_lon=config['gps']['lon']
+            )
+        }
+
+    def update_sensor(self, sensor_type: str, params: Dict[str, Any]) -> Tuple[bool, str]:
+        """
+        Met à jour les paramètres d'un capteur et l'applique à chaud.
+
+        Args:
+            sensor_type: Nom du capteur ('temperature', 'humidity', 'gps')
+            params: Paramètres à modifier
+
+        Returns:
+            Tuple (succès, message)
+        """
+        if sensor_type not in self.config['sensors']:
+            return False, 'Capteur inconnu'
+
+        config = self.config['sensors'][sensor_type]
+        if not self._valid_params(config, params):
+            return False, 'Paramètres invalides'
+
+        config.update(params)
+
+        if sensor_type == 'temperature':
+            self.sensors[sensor_type] = TemperatureSensor(
+                base_temp=config['base_temp'],
+                noise_range=config['noise_range']
+            )
+        elif sensor_type == 'humidity':
+            self.sensors[sensor_type].current_humidity = config['initial_humidity']
+        elif sensor_type == 'gps':
+            self.sensors[sensor_type].current_lat = config['lat']
+            self.sensors[sensor_type].current_lon = config['lon']
+
+        logger.info(f"[{self.device_id}] Paramètres du capteur {sensor_type} mis à jour")
+        return True, 'Capteur mis à jour'
+
+    @staticmethod
+    def _valid_params(config: Dict[str, Any], params: Any) -> bool:
+        """
+        Vérifie que les paramètres correspondent aux clés connues du capteur.
+        'enabled' doit être un booléen, les autres valeurs des nombres.
+
+        Args:
+            config: Configuration actuelle du capteur
+            params: Paramètres reçus
+
+        Returns:
+            True si tous les paramètres sont valides, False sinon
+        """
+        if not isinstance(params, dict):
+            return False
+
+        for key, value in params.items():
+            if key not in config:
+                return False
+            if isinstance(config[key], bool):
+                if not isinstance(value, bool):
+                    return False
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                return False
+        return True
+
+    def update_interval(self, interval: Any) -> Tuple[bool, str]:
+        """
+        Met à jour l'intervalle de publication.
+
+        Args:
+            interval: Nouvel intervalle en secondes (0.1-60s)
+
+        Returns:
+            Tuple (succès, message)
+        """
+        if (isinstance(interval, bool) or not isinstance(interval, (int, float))
+                or interval < 0.1 or interval > 60):
+            return False, 'Intervalle invalide (0.1-60s)'
+
+        self.config['interval'] = interval
+        logger.info(f"[{self.device_id}] Intervalle mis à jour: {interval}s")
+        return True, f'Intervalle défini à {interval}s'
+
+    def reboot(self) -> Tuple[bool, str]:
+        """
+        Simule un redémarrage : les capteurs repartent de leur configuration.
+
+        Returns:
+            Tuple (succès, message)
+        """
+        self.init_sensors()
+        logger.info(f"[{self.device_id}] Redémarrage effectué")
+        return True, 'Device redémarré'
+
+    def handle_command(self, command: Any) -> Dict[str, Any]:
+        """
+        Applique une commande et construit la réponse d'acquittement.
+
+        Args:
+            command: Commande JSON, ex:
+                     {"request_id": "...", "command": "update_sensor",
+                      "sensor": "temperature", "params": {...}}
+
+        Returns:
+            Dictionnaire d'acquittement à publier
+        """
+        if not isinstance(command, dict):
+            # JSON valide mais pas un objet : répondre quand même en erreur
+            command = {}
+            name = None
+            ok, message = False, 'Commande invalide'
+        else:
+            name = command.get('command')
+            ok, message = self._apply_command(name, command)
+
+        return {
+            'request_id': command.get('request_id'),
+            'device_id': self.device_id,
+            'command': name,
+            'status': 'success' if ok else 'error',
+            'message': message,
+            'sent_at': command.get('sent_at'),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+
+    def _apply_command(self, name: Any, command: Dict[str, Any]) -> Tuple[bool, str]:
+        """
+        Exécute une commande via les méthodes de mise à jour du device.
+
+        Args:
+            name: Nom de la commande
+            command: Commande complète
+
+        Returns:
+            Tuple (succès, message)
+        """
+        if name == 'update_sensor':
+            return self.update_sensor(command.get('sensor'), command.get('params'))
+        if name == 'update_interval':
+            return self.update_interval(command.get('interval'))
+        if name == 'reboot':
+            return self.reboot()
+        return False, f'Commande inconnue: {name}'
+
+    def attach(self, mqtt_client):
+        """
+        Enregistre le device sur le routeur de commandes d'un client MQTT.
+        Le client doit être abonné à COMMAND_SUBSCRIPTION.
+
+        Args:
+            mqtt_client: Instance de MQTTClient
+        """
+        if self.mqtt_client is not None:
+            self.detach()
+        self.mqtt_client = mqtt_client
+        mqtt_client.add_route(COMMAND_TOPIC.format(device_id=self.device_id), self._on_command)
+
+    def detach(self):
+        """
+        Retire le device du routeur de commandes.
+        """
+        if self.mqtt_client is not None:
+            self.mqtt_client.remove_route(
+                COMMAND_TOPIC.format(device_id=self.device_id), self._on_command
+            )
+            self.mqtt_client = None
+
+    def _on_command(self, topic: str, data: Any):
+        """
+        Handler MQTT : applique la commande et publie l'acquittement.
+        Un acquittement est publié pour chaque message JSON décodé, même
+        invalide (JSON qui n'est pas un objet : voir handle_command).
+        Un payload qui n'est pas du JSON UTF-8 est rejeté par MQTTClient
+        avant d'arriver ici et ne reçoit pas d'acquittement : sans
+        request_id, l'émetteur ne pourrait de toute façon pas l'associer.
+
+        Args:
+            topic: Topic de commande du device
+            data: Commande décodée
+        """
+        received = time.perf_counter()
+        ack = self.handle_command(data)
+        ack['processing_ms'] = round((time.perf_counter() - received) * 1000, 3)
+
+        if self.mqtt_client is not None:
+            self.mqtt_client.publish(
+                ACK_TOPIC.format(device_id=self.device_id), ack, qos=1
+            )
@@ -6,6 +6,8 @@ Fournit un dashboard en temps réel et des contrôles pour les capteurs.
 from flask import Flask, render_template, jsonify, request, send_file
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
+import os
+import copy
 import json
 import threading
 import time
@@ -13,7 +15,7 @@ import logging
 import uuid
 import qrcode
 from io import BytesIO
-from sensors import TemperatureSensor, HumiditySensor, GPSSensor
+from devices import SimulatedDevice, DEFAULT_CONFIG, COMMAND_TOPIC
 from mqtt_client import MQTTClient
 
 # Configuration du logging
@@ -29,60 +31,23 @@ app.config['SECRET_KEY'] = 'iot_simulator_secret_2025'
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=True, engineio_logger=True)
 
-# État global du simulateur
+# État global du simulateur (configuration par défaut définie dans devices.py)
 simulator_state = {
     'running': False,
-    'interval': 1.0,
     'session_id': str(uuid.uuid4()),  # ID unique de session
-    'sensors': {
-        'temperature': {
-            'base_temp': 22.0,
-            'noise_range': 2.5,
-            'enabled': True
-        },
-        'humidity': {
-            'initial_humidity': 55.0,
-            'enabled': True
-        },
-        'gps': {
-            'lat': 48.8566,
-            'lon': 2.3522,
-            'enabled': True
-        }
-    }
+    **copy.deepcopy(DEFAULT_CONFIG)
 }
 
-# Instances des capteurs et client MQTT
-sensors = {}
+# Device simulé (partage la configuration de simulator_state) et client MQTT
+device = SimulatedDevice(os.getenv('DEVICE_ID', 'simulator'), simulator_state)
 mqtt_client = None
 simulation_thread = None
 
 
-def init_sensors():
-    """Initialise les capteurs avec les paramètres actuels."""
-    global sensors
-    
-    config = simulator_state['sensors']
-    sensors = {
-        'temperature': TemperatureSensor(
-            base_temp=config['temperature']['base_temp'],
-            noise_range=config['temperature']['noise_range']
-        ),
-        'humidity': HumiditySensor(
-            initial_humidity=config['humidity']['initial_humidity']
-        ),
-        'gps': GPSSensor(
-            initial_lat=config['gps']['lat'],
-            initial_lon=config['gps']['lon']
-        )
-    }
-
-
 def init_mqtt():
     """Initialise le client MQTT."""
     global mqtt_client
     
-    import os
     broker_host = os.getenv('BROKER_HOST', 'localhost')
     broker_port = int(os.getenv('BROKER_PORT', '1883'))
     
@@ -92,6 +57,10 @@ def init_mqtt():
         client_id="iot_simulator_web"
     )
     
+    # Commandes descendantes : uniquement le topic de ce device
+    mqtt_client.subscribe(COMMAND_TOPIC.format(device_id=device.device_id), qos=1)
+    device.attach(mqtt_client)
+    
     if mqtt_client.connect(timeout=10):
         logger.info(f"✓ Connecté au broker MQTT ({broker_host}:{broker_port})")
         return True
@@ -115,7 +84,7 @@ def simulation_loop():
     while simulator_state['running']:
         try:
             # Lire et publier chaque capteur activé
-            for sensor_name, sensor in sensors.items():
+            for sensor_name, sensor in device.sensors.items():
                 if simulator_state['sensors'][sensor_name]['enabled']:
                     data = sensor.read()
                     
@@ -226,7 +195,7 @@ def start_simulation():
         return jsonify({'status': 'error', 'message': 'Simulation déjà en cours'})
     
     # Initialiser les capteurs et MQTT
-    init_sensors()
+    device.init_sensors()
     if not init_mqtt():
         return jsonify({'status': 'error', 'message': 'Impossible de se connecter au broker MQTT'})
     
@@ -260,44 +229,18 @@ def stop_simulation():
 def update_sensor():
     """Met à jour les paramètres d'un capteur."""
     data = request.json
-    sensor_type = data.get('sensor')
-    params = data.get('params')
-    
-    if sensor_type not in simulator_state['sensors']:
-        return jsonify({'status': 'error', 'message': 'Capteur inconnu'})
-    
-    # Mettre à jour les paramètres
-    simulator_state['sensors'][sensor_type].update(params)
+    ok, message = device.update_sensor(data.get('sensor'), data.get('params'))
     
-    # Si la simulation est active, recréer le capteur
-    if simulator_state['running'] and sensor_type in sensors:
-        if sensor_type == 'temperature':
-            sensors[sensor_type] = TemperatureSensor(
-                base_temp=simulator_state['sensors'][sensor_type]['base_temp'],
-                noise_range=simulator_state['sensors'][sensor_type]['noise_range']
-            )
-        elif sensor_type == 'humidity':
-            sensors[sensor_type].current_humidity = simulator_state['sensors'][sensor_type]['initial_humidity']
-        elif sensor_type == 'gps':
-            sensors[sensor_type].current_lat = simulator_state['sensors'][sensor_type]['lat']
-            sensors[sensor_type].current_lon = simulator_state['sensors'][sensor_type]['lon']
-    
-    logger.info(f"Paramètres du capteur {sensor_type} mis à jour")
-    return jsonify({'status': 'success', 'message': 'Capteur mis à jour'})
+    return jsonify({'status': 'success' if ok else 'error', 'message': message})
 
 
 @app.route('/api/update_interval', methods=['POST'])
 def update_interval():
     """Met à jour l'intervalle de publication."""
     data = request.json
-    interval = data.get('interval', 1.0)
-    
-    if interval < 0.1 or interval > 60:
-        return jsonify({'status': 'error', 'message': 'Intervalle invalide (0.1-60s)'})
+    ok, message = device.update_interval(data.get('interval', 1.0))
     
-    simulator_state['interval'] = interval
-    logger.info(f"Intervalle mis à jour: {interval}s")
-    return jsonify({'status': 'success', 'message': f'Intervalle défini à {interval}s'})
+    return jsonify({'status': 'success' if ok else 'error', 'message': message})
 
 
 @socketio.on('connect')
@@ -314,7 +257,6 @@ def handle_disconnect():
 
 
 if __name__ == '__main__':
-    import os
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('PORT', '5000'))
     
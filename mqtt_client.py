@@ -7,7 +7,8 @@ import json
 import time
 import logging
 import uuid
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Optional, Callable, List
 import paho.mqtt.client as mqtt
 
 
@@ -19,6 +20,130 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Signature des handlers de messages entrants : handler(topic, data)
+MessageHandler = Callable[[str, Dict[str, Any]], None]
+
+
+class TopicTrie:
+    """
+    Index des handlers de messages indexé par niveaux de topic MQTT.
+    Le routage d'un message coûte O(profondeur du topic) au lieu d'un
+    parcours linéaire de tous les abonnements, ce qui permet d'enregistrer
+    des centaines de milliers de devices sur un seul client.
+    Supporte les wildcards MQTT '+' (un niveau) et '#' (niveaux restants).
+    Comme l'impose MQTT 3.1.1 (§4.7.2), les wildcards de premier niveau
+    ne correspondent pas aux topics commençant par '$' (ex: $SYS).
+    """
+    
+    def __init__(self):
+        """
+        Initialise un trie vide.
+        """
+        self.root = _TrieNode()
+        self.size = 0
+    
+    def add(self, topic_filter: str, handler: MessageHandler):
+        """
+        Enregistre un handler pour un filtre de topic.
+        
+        Args:
+            topic_filter: Topic exact ou filtre avec wildcards ('+', '#')
+            handler: Fonction appelée avec (topic, data)
+        """
+        node = self.root
+        for level in topic_filter.split('/'):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _TrieNode()
+            node = child
+        node.handlers.append(handler)
+        self.size += 1
+    
+    def remove(self, topic_filter: str, handler: MessageHandler) -> bool:
+        """
+        Supprime un handler précédemment enregistré.
+        
+        Args:
+            topic_filter: Filtre utilisé lors de l'enregistrement
+            handler: Handler à supprimer
+            
+        Returns:
+            True si le handler a été supprimé, False sinon
+        """
+        path = [self.root]
+        levels = topic_filter.split('/')
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+        
+        if handler not in path[-1].handlers:
+            return False
+        path[-1].handlers.remove(handler)
+        self.size -= 1
+        
+        # Élaguer les noeuds devenus vides
+        for depth in range(len(levels), 0, -1):
+            node = path[depth]
+            if node.handlers or node.children:
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+        return True
+    
+    def match(self, topic: str) -> List[MessageHandler]:
+        """
+        Retourne les handlers dont le filtre correspond au topic.
+        
+        Args:
+            topic: Topic concret d'un message reçu
+            
+        Returns:
+            Liste des handlers correspondants
+        """
+        handlers = []
+        nodes = [self.root]
+        # Pas de wildcard au premier niveau pour les topics '$...'
+        wildcards = not topic.startswith('$')
+        for level in topic.split('/'):
+            next_nodes = []
+            for node in nodes:
+                wildcard = node.children.get('#') if wildcards else None
+                if wildcard is not None:
+                    handlers.extend(wildcard.handlers)
+                for key in ((level, '+') if wildcards else (level,)):
+                    child = node.children.get(key)
+                    if child is not None:
+                        next_nodes.append(child)
+            if not next_nodes:
+                return handlers
+            nodes = next_nodes
+            wildcards = True
+        
+        for node in nodes:
+            handlers.extend(node.handlers)
+            # '#' correspond aussi au niveau parent (ex: "a/#" reçoit "a")
+            wildcard = node.children.get('#')
+            if wildcard is not None:
+                handlers.extend(wildcard.handlers)
+        return handlers
+    
+    def __len__(self) -> int:
+        return self.size
+
+
+class _TrieNode:
+    """
+    Noeud interne du TopicTrie.
+    """
+    
+    __slots__ = ('children', 'handlers')
+    
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.handlers: List[MessageHandler] = []
+
+
 class MQTTClient:
     """
     Client MQTT pour publier les données des capteurs.
@@ -47,6 +172,15 @@ class MQTTClient:
         self.keepalive = keepalive
         self.connected = False
         
+        # Abonnements broker (rejoués à la reconnexion) et routage local
+        self.subscriptions: Dict[str, int] = {}
+        self.routes = TopicTrie()
+        
+        # Suivi des SUBACK : mid en attente -> filtre, filtres acquittés
+        self._subscribe_lock = threading.Lock()
+        self._pending_subacks: Dict[int, str] = {}
+        self.subscribed = set()
+        
         # Création du client MQTT avec protocole explicite MQTT v3.1.1
         self.client = mqtt.Client(
             client_id=self.client_id,
@@ -61,6 +195,8 @@ class MQTTClient:
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_publish = self._on_publish
+        self.client.on_message = self._on_message
+        self.client.on_subscribe = self._on_subscribe
     
     def _on_connect(self, client, userdata, flags, rc):
         """
@@ -75,6 +211,11 @@ class MQTTClient:
         if rc == 0:
             self.connected = True
             logger.info(f"✓ Connecté au broker MQTT {self.broker_host}:{self.broker_port}")
+            
+            # Session non persistante : rétablir les abonnements
+            # (copie : subscribe() peut être appelé depuis un autre thread)
+            for topic_filter, qos in list(self.subscriptions.items()):
+                self._send_subscribe(topic_filter, qos)
         else:
             self.connected = False
             error_messages = {
@@ -97,6 +238,9 @@ class MQTTClient:
             rc: Code de retour de déconnexion
         """
         self.connected = False
+        with self._subscribe_lock:
+            self._pending_subacks.clear()
+            self.subscribed.clear()
         if rc != 0:
             logger.warning(f"⚠ Déconnexion inattendue du broker. Code: {rc}")
             logger.info("↻ Tentative de reconnexion automatique...")
@@ -114,6 +258,55 @@ class MQTTClient:
         """
         logger.debug(f"Message {mid} publié avec succès")
     
+    def _on_subscribe(self, client, userdata, mid, granted_qos):
+        """
+        Callback appelé à la réception d'un SUBACK.
+        
+        Args:
+            client: Instance du client MQTT
+            userdata: Données utilisateur
+            mid: Message ID de la demande d'abonnement
+            granted_qos: QoS accordés par le broker (128 = refus)
+        """
+        with self._subscribe_lock:
+            topic_filter = self._pending_subacks.pop(mid, None)
+            if topic_filter is None:
+                return
+            if 128 in granted_qos:
+                logger.error(f"✗ Abonnement refusé par le broker: {topic_filter}")
+                return
+            self.subscribed.add(topic_filter)
+        logger.debug(f"Abonnement {topic_filter} acquitté")
+    
+    def _on_message(self, client, userdata, msg):
+        """
+        Callback appelé à la réception d'un message.
+        Décode le JSON et le route vers les handlers via le TopicTrie.
+        Un payload non décodable (UTF-8 ou JSON invalide) est journalisé
+        puis ignoré : aucun handler n'est appelé.
+        
+        Args:
+            client: Instance du client MQTT
+            userdata: Données utilisateur
+            msg: Message MQTT reçu
+        """
+        handlers = self.routes.match(msg.topic)
+        if not handlers:
+            logger.debug(f"Aucun handler pour {msg.topic}")
+            return
+        
+        try:
+            data = json.loads(msg.payload.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            logger.warning(f"⚠ Message invalide sur {msg.topic}: {e}")
+            return
+        
+        for handler in handlers:
+            try:
+                handler(msg.topic, data)
+            except Exception as e:
+                logger.error(f"✗ Erreur du handler pour {msg.topic}: {e}")
+    
     def connect(self, timeout: int = 10) -> bool:
         """
         Connecte le client au broker MQTT avec timeout.
@@ -195,6 +388,99 @@ class MQTTClient:
             logger.error(f"✗ Exception lors de la publication: {e}")
             return False
     
+    def subscribe(self, topic_filter: str, qos: int = 1) -> bool:
+        """
+        S'abonne à un filtre de topic auprès du broker.
+        Les messages reçus sont distribués aux handlers enregistrés
+        via add_route().
+        
+        Args:
+            topic_filter: Filtre de topic (ex: "iot/device/+/cmd")
+            qos: Quality of Service (0, 1 ou 2)
+            
+        Returns:
+            True si la demande d'abonnement a été envoyée, False sinon
+        """
+        self.subscriptions[topic_filter] = qos
+        
+        if not self.connected:
+            # L'abonnement sera effectué à la connexion
+            return False
+        
+        return self._send_subscribe(topic_filter, qos)
+    
+    def _send_subscribe(self, topic_filter: str, qos: int) -> bool:
+        """
+        Envoie une demande d'abonnement et mémorise son mid pour le SUBACK.
+        
+        Args:
+            topic_filter: Filtre de topic
+            qos: Quality of Service
+            
+        Returns:
+            True si la demande a été envoyée, False sinon
+        """
+        # Verrou tenu pendant l'envoi : le SUBACK ne peut pas être traité
+        # avant que le mid soit enregistré
+        with self._subscribe_lock:
+            self.subscribed.discard(topic_filter)
+            result, mid = self.client.subscribe(topic_filter, qos=qos)
+            if result == mqtt.MQTT_ERR_SUCCESS:
+                self._pending_subacks[mid] = topic_filter
+        
+        if result == mqtt.MQTT_ERR_SUCCESS:
+            logger.info(f"✓ Abonné à {topic_filter}")
+            return True
+        
+        logger.error(f"✗ Erreur d'abonnement à {topic_filter}")
+        return False
+    
+    def wait_subscribed(self, timeout: float = 10) -> bool:
+        """
+        Attend que le broker ait acquitté (SUBACK) tous les abonnements.
+        
+        Args:
+            timeout: Timeout en secondes
+            
+        Returns:
+            True si tous les abonnements sont acquittés, False sinon
+        """
+        elapsed = 0.0
+        while elapsed < timeout:
+            with self._subscribe_lock:
+                if self.connected and set(self.subscriptions) <= self.subscribed:
+                    return True
+            time.sleep(0.05)
+            elapsed += 0.05
+        
+        logger.error(f"Timeout d'attente des SUBACK après {timeout}s")
+        return False
+    
+    def add_route(self, topic_filter: str, handler: MessageHandler):
+        """
+        Enregistre un handler local pour les messages reçus.
+        N'envoie rien au broker : un seul abonnement wildcard peut
+        alimenter un grand nombre de routes exactes.
+        
+        Args:
+            topic_filter: Topic exact ou filtre avec wildcards
+            handler: Fonction appelée avec (topic, data)
+        """
+        self.routes.add(topic_filter, handler)
+    
+    def remove_route(self, topic_filter: str, handler: MessageHandler) -> bool:
+        """
+        Supprime un handler local.
+        
+        Args:
+            topic_filter: Filtre utilisé lors de l'enregistrement
+            handler: Handler à supprimer
+            
+        Returns:
+            True si supprimé, False sinon
+        """
+        return self.routes.remove(topic_filter, handler)
+    
     def is_connected(self) -> bool:
         """
         Vérifie si le client est connecté au broker.
@@ -0,0 +1,135 @@
+"""
+Tests du traitement des commandes descendantes par SimulatedDevice.
+"""
+
+import pytest
+
+from devices import SimulatedDevice, COMMAND_TOPIC, ACK_TOPIC
+
+
+class RecordingClient:
+    """
+    Double de MQTTClient : enregistre les routes et les publications.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.published = []
+
+    def add_route(self, topic_filter, handler):
+        self.routes[topic_filter] = handler
+
+    def remove_route(self, topic_filter, handler):
+        return self.routes.pop(topic_filter, None) is not None
+
+    def publish(self, topic, data, qos=1, retain=False):
+        self.published.append((topic, data))
+        return True
+
+
+@pytest.fixture
+def device():
+    return SimulatedDevice("dev1")
+
+
+def test_update_sensor_applies_change(device):
+    ack = device.handle_command({
+        'request_id': '1',
+        'command': 'update_sensor',
+        'sensor': 'temperature',
+        'params': {'base_temp': 30.0}
+    })
+
+    assert ack['status'] == 'success'
+    assert ack['request_id'] == '1'
+    assert device.config['sensors']['temperature']['base_temp'] == 30.0
+    assert device.sensors['temperature'].base_temp == 30.0
+
+
+def test_update_sensor_accepts_enabled_flag(device):
+    ok, _ = device.update_sensor('gps', {'enabled': False})
+
+    assert ok
+    assert device.config['sensors']['gps']['enabled'] is False
+
+
+@pytest.mark.parametrize('params', [
+    {'base_temp': 'hot'},
+    {'base_temp': True},
+    {'base_temp': None},
+    {'unknown': 1.0},
+    {'enabled': 1},
+    {'base_temp': 25.0, 'noise_range': 'x'},
+    ['base_temp', 25.0],
+])
+def test_update_sensor_rejects_invalid_params(device, params):
+    before = dict(device.config['sensors']['temperature'])
+    sensor = device.sensors['temperature']
+
+    ack = device.handle_command({
+        'command': 'update_sensor', 'sensor': 'temperature', 'params': params
+    })
+
+    assert ack['status'] == 'error'
+    assert ack['message'] == 'Paramètres invalides'
+    assert device.config['sensors']['temperature'] == before
+    assert device.sensors['temperature'] is sensor
+    device.sensors['temperature'].read()
+
+
+def test_update_sensor_unknown_sensor(device):
+    ack = device.handle_command({'command': 'update_sensor', 'sensor': 'pressure', 'params': {}})
+
+    assert ack['status'] == 'error'
+    assert ack['message'] == 'Capteur inconnu'
+
+
+@pytest.mark.parametrize('interval', [True, 'fast', None, 0.01, 120])
+def test_update_interval_rejects_invalid_values(device, interval):
+    ack = device.handle_command({'command': 'update_interval', 'interval': interval})
+
+    assert ack['status'] == 'error'
+    assert device.config['interval'] == 1.0
+
+
+def test_update_interval_applies_change(device):
+    ack = device.handle_command({'command': 'update_interval', 'interval': 2.5})
+
+    assert ack['status'] == 'success'
+    assert device.config['interval'] == 2.5
+
+
+def test_unknown_command(device):
+    ack = device.handle_command({'request_id': '7', 'command': 'selfdestruct'})
+
+    assert ack['status'] == 'error'
+    assert ack['request_id'] == '7'
+
+
+@pytest.mark.parametrize('payload', [[1, 2], "str", None, 42])
+def test_non_object_payload_is_acked_as_error(device, payload):
+    client = RecordingClient()
+    device.attach(client)
+
+    client.routes[COMMAND_TOPIC.format(device_id='dev1')]('iot/device/dev1/cmd', payload)
+
+    assert len(client.published) == 1
+    topic, ack = client.published[0]
+    assert topic == ACK_TOPIC.format(device_id='dev1')
+    assert ack['status'] == 'error'
+    assert ack['device_id'] == 'dev1'
+
+
+def test_command_publishes_ack(device):
+    client = RecordingClient()
+    device.attach(client)
+
+    client.routes[COMMAND_TOPIC.format(device_id='dev1')](
+        'iot/device/dev1/cmd', {'request_id': '9', 'command': 'reboot', 'sent_at': 123.0}
+    )
+
+    topic, ack = client.published[0]
+    assert topic == ACK_TOPIC.format(device_id='dev1')
+    assert ack['status'] == 'success'
+    assert ack['sent_at'] == 123.0
+    assert 'processing_ms' in ack
@@ -0,0 +1,219 @@
+"""
+Tests du routage des messages entrants (TopicTrie et MQTTClient).
+"""
+
+import json
+import logging
+import pytest
+
+mqtt = pytest.importorskip("paho.mqtt.client")
+
+from devices import SimulatedDevice, COMMAND_SUBSCRIPTION
+from mqtt_client import MQTTClient, TopicTrie
+
+
+def handler_a(topic, data):
+    pass
+
+
+def handler_b(topic, data):
+    pass
+
+
+def handler_c(topic, data):
+    pass
+
+
+def test_exact_match():
+    trie = TopicTrie()
+    trie.add("iot/device/dev1/cmd", handler_a)
+
+    assert trie.match("iot/device/dev1/cmd") == [handler_a]
+    assert trie.match("iot/device/dev2/cmd") == []
+    assert trie.match("iot/device/dev1") == []
+    assert trie.match("iot/device/dev1/cmd/extra") == []
+
+
+def test_plus_wildcard_matches_one_level():
+    trie = TopicTrie()
+    trie.add("iot/device/+/cmd", handler_a)
+    trie.add("iot/device/dev1/cmd", handler_b)
+
+    assert sorted(trie.match("iot/device/dev1/cmd"), key=id) == sorted([handler_a, handler_b], key=id)
+    assert trie.match("iot/device/dev2/cmd") == [handler_a]
+    assert trie.match("iot/device/a/b/cmd") == []
+
+
+def test_hash_wildcard_matches_remaining_levels():
+    trie = TopicTrie()
+    trie.add("iot/#", handler_a)
+
+    assert trie.match("iot/device/dev1/cmd") == [handler_a]
+    assert trie.match("iot/sensor") == [handler_a]
+    assert trie.match("other/sensor") == []
+
+
+def test_hash_wildcard_matches_parent_level():
+    trie = TopicTrie()
+    trie.add("iot/device/#", handler_a)
+
+    assert trie.match("iot/device") == [handler_a]
+    assert trie.match("iot") == []
+
+
+def test_wildcards_do_not_match_dollar_topics_at_first_level():
+    trie = TopicTrie()
+    trie.add("#", handler_a)
+    trie.add("+/+", handler_b)
+    trie.add("$SYS/#", handler_c)
+
+    assert trie.match("$SYS/x") == [handler_c]
+    assert trie.match("iot/x") == [handler_a, handler_b]
+
+
+def test_remove_prunes_empty_nodes():
+    trie = TopicTrie()
+    trie.add("iot/device/dev1/cmd", handler_a)
+    trie.add("iot/device/+/cmd", handler_b)
+
+    assert trie.remove("iot/device/dev1/cmd", handler_a)
+    assert len(trie) == 1
+    assert list(trie.root.children["iot"].children["device"].children) == ["+"]
+
+    assert trie.remove("iot/device/+/cmd", handler_b)
+    assert len(trie) == 0
+    assert trie.root.children == {}
+
+
+def test_remove_unknown_route_returns_false():
+    trie = TopicTrie()
+    trie.add("iot/device/dev1/cmd", handler_a)
+
+    assert not trie.remove("iot/device/dev2/cmd", handler_a)
+    assert not trie.remove("iot/device/dev1/cmd", handler_b)
+    assert len(trie) == 1
+
+
+class Message:
+    """
+    Message MQTT minimal (topic + payload) pour appeler _on_message.
+    """
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+
+
+@pytest.fixture
+def client():
+    return MQTTClient(client_id="test_client")
+
+
+def recorder(calls, name):
+    def handler(topic, data):
+        calls.append((name, topic, data))
+    return handler
+
+
+def test_on_message_routes_to_matching_handler_only(client):
+    calls = []
+    for device_id in ("dev1", "dev2", "dev3"):
+        client.add_route(f"iot/device/{device_id}/cmd", recorder(calls, device_id))
+
+    client._on_message(None, None, Message("iot/device/dev2/cmd", {"command": "reboot"}))
+
+    assert calls == [("dev2", "iot/device/dev2/cmd", {"command": "reboot"})]
+
+
+def test_on_message_reaches_device_and_publishes_ack(client, monkeypatch):
+    published = []
+    monkeypatch.setattr(client, "publish", lambda topic, data, qos=1, retain=False: published.append((topic, data)))
+    devices = [SimulatedDevice(f"dev{i}") for i in range(3)]
+    for device in devices:
+        device.attach(client)
+
+    client._on_message(None, None, Message(
+        "iot/device/dev1/cmd",
+        {"request_id": "r1", "command": "update_interval", "interval": 5.0}
+    ))
+
+    assert devices[1].config['interval'] == 5.0
+    assert devices[0].config['interval'] == 1.0
+    assert devices[2].config['interval'] == 1.0
+    assert len(published) == 1
+    topic, ack = published[0]
+    assert topic == "iot/device/dev1/ack"
+    assert ack['request_id'] == "r1"
+    assert ack['status'] == "success"
+
+
+@pytest.mark.parametrize("payload", [b"{not json", b"\xff\xfe"])
+def test_on_message_drops_undecodable_payload(client, payload, caplog):
+    calls = []
+    client.add_route("iot/device/dev1/cmd", recorder(calls, "dev1"))
+
+    with caplog.at_level(logging.WARNING, logger="mqtt_client"):
+        client._on_message(None, None, Message("iot/device/dev1/cmd", payload))
+
+    assert calls == []
+    assert "Message invalide" in caplog.text
+
+
+def test_on_message_failing_handler_does_not_stop_others(client):
+    calls = []
+
+    def failing(topic, data):
+        raise RuntimeError("boom")
+
+    client.add_route("iot/device/+/cmd", failing)
+    client.add_route("iot/device/dev1/cmd", recorder(calls, "dev1"))
+
+    client._on_message(None, None, Message("iot/device/dev1/cmd", {"command": "reboot"}))
+
+    assert calls == [("dev1", "iot/device/dev1/cmd", {"command": "reboot"})]
+
+
+def test_on_message_without_route_returns_before_decoding(client, caplog):
+    calls = []
+    client.add_route("iot/device/dev1/cmd", recorder(calls, "dev1"))
+
+    with caplog.at_level(logging.WARNING, logger="mqtt_client"):
+        client._on_message(None, None, Message("iot/device/dev9/cmd", b"{not json"))
+
+    assert calls == []
+    assert "Message invalide" not in caplog.text
+
+
+def test_subscribe_before_connect_is_replayed_on_connect(client, monkeypatch):
+    sent = []
+
+    def fake_subscribe(topic_filter, qos=0):
+        sent.append((topic_filter, qos))
+        return mqtt.MQTT_ERR_SUCCESS, len(sent)
+
+    monkeypatch.setattr(client.client, "subscribe", fake_subscribe)
+
+    assert client.subscribe(COMMAND_SUBSCRIPTION, qos=1) is False
+    assert client.subscriptions == {COMMAND_SUBSCRIPTION: 1}
+    assert sent == []
+
+    client._on_connect(None, None, {}, 0)
+
+    assert client.connected
+    assert sent == [(COMMAND_SUBSCRIPTION, 1)]
+    assert not client.wait_subscribed(timeout=0.1)
+
+    client._on_subscribe(None, None, 1, (1,))
+
+    assert client.wait_subscribed(timeout=0.1)
+
+
+def test_refused_subscription_is_not_marked_subscribed(client, monkeypatch):
+    monkeypatch.setattr(client.client, "subscribe", lambda topic_filter, qos=0: (mqtt.MQTT_ERR_SUCCESS, 7))
+    client.subscribe(COMMAND_SUBSCRIPTION)
+    client._on_connect(None, None, {}, 0)
+
+    client._on_subscribe(None, None, 7, (128,))
+
+    assert COMMAND_SUBSCRIPTION not in client.subscribed
+    assert not client.wait_subscribed(timeout=0.1)